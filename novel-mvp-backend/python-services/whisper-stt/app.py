@@ -6,20 +6,39 @@ Provides Korean speech-to-text services for Novel MVP
 
 import os
 import io
+import array
+import asyncio
+import functools
+import gc
+import itertools
 import logging
+import math
 import tempfile
-from typing import Optional, List, Dict, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from typing import Optional, List, Dict, Any, BinaryIO, Tuple
 from pathlib import Path
 
-import whisper
+from faster_whisper import WhisperModel
+from faster_whisper.audio import pad_or_trim
+from faster_whisper.feature_extractor import FeatureExtractor
+from faster_whisper.tokenizer import Tokenizer
+from faster_whisper.transcribe import get_suppressed_tokens, restore_speech_timestamps
+from faster_whisper.vad import get_speech_timestamps, get_vad_model
 import uvicorn
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+import av
 import torch
+import torchaudio
 import numpy as np
-import librosa
+import soundfile as sf
+from numba import njit
 from datetime import datetime
 
 # Configure logging
@@ -29,11 +48,24 @@ logger = logging.getLogger(__name__)
 # Configuration
 class Config:
     MODEL_NAME = os.getenv("WHISPER_MODEL", "base")  # base, small, medium, large
+    BACKEND = os.getenv("WHISPER_BACKEND", "ctranslate2")  # ctranslate2, trt, ort
+    COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE")  # overrides pick_compute_type()
+    TRT_ENGINE_PATH = os.getenv("WHISPER_TRT_ENGINE")  # default: /root/.cache/whisper-trt/<model>-sm<cc>-b<batch>-encoder.engine
+    ENCODER_ONNX_PATH = os.getenv("WHISPER_ENCODER_ONNX")  # optimum encoder export (trt build / ort)
+    CUDA_GRAPH = os.getenv("WHISPER_CUDA_GRAPH", "true").lower() == "true"  # trt backend only
     DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
     LANGUAGE = "ko"  # Korean as default
     TEMPERATURE = 0.0
     MAX_FILE_SIZE = 25 * 1024 * 1024  # 25MB
     SAMPLE_RATE = 16000
+    MODEL_CONCURRENCY = int(os.getenv("WHISPER_MODEL_CONCURRENCY", "2"))  # in-flight calls per replica
+    AUDIO_BUFFERS = int(os.getenv("WHISPER_AUDIO_BUFFERS", "32"))  # max requests from decode until their model call returns
+    BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))  # max quick requests per batch
+    BATCH_WAIT_MS = float(os.getenv("WHISPER_BATCH_WAIT_MS", "10"))
+    BATCH_BUCKETS = [2, 5, 10, 20, 30]  # seconds, requests are grouped by duration
+    NO_SPEECH_THRESHOLD = 0.6
+    LOG_PROB_THRESHOLD = -1.0  # a clip is only treated as silent if decoding was also unconfident
+    SESSION_TTL = 60.0  # seconds a /transcribe-stream session keeps its decoder context
     
 config = Config()
 
@@ -64,8 +96,9 @@ class ModelInfo(BaseModel):
 # Initialize FastAPI app
 app = FastAPI(
     title="Whisper STT Server",
-    description="OpenAI Whisper Speech-to-Text API for Novel MVP",
-    version="1.0.0"
+    description="OpenAI Whisper (faster-whisper) Speech-to-Text API for Novel MVP",
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -77,38 +110,520 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global model instance
-whisper_model = None
+class ModelPool:
+    """Whisper model replicas (one per GPU) with least-loaded dispatch"""
+    
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max_in_flight
+        self.models: List[WhisperModel] = []
+        self.weights: List[float] = []
+        self.in_flight: List[int] = []
+        self.semaphores: List[asyncio.Semaphore] = []
+    
+    def add(self, model: WhisperModel, weight: float = 1.0):
+        self.models.append(model)
+        self.weights.append(weight)
+        self.in_flight.append(0)
+        self.semaphores.append(asyncio.Semaphore(self.max_in_flight))
+    
+    def __len__(self):
+        return len(self.models)
+    
+    @asynccontextmanager
+    async def acquire(self):
+        """Borrow the replica with the lowest in-flight load relative to its throughput weight"""
+        index = min(range(len(self.models)), key=lambda i: self.in_flight[i] / self.weights[i])
+        self.in_flight[index] += 1
+        try:
+            async with self.semaphores[index]:
+                yield self.models[index]
+        finally:
+            self.in_flight[index] -= 1
+
+# Global model pool
+whisper_pool = ModelPool(config.MODEL_CONCURRENCY)
+# Set once every replica has been warmed up
+models_ready = False
+
+# Model calls block for seconds; they run here so the event loop keeps serving uploads.
+# CTranslate2 and torch release the GIL while kernels run. Sized once the replicas are
+# loaded so every semaphore permit in the pool has a thread to run on.
+TRANSCRIBE_POOL: Optional[ThreadPoolExecutor] = None
+
+async def run_model(func, *args, **kwargs):
+    """Run a blocking model call on the transcription thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(TRANSCRIBE_POOL, functools.partial(func, *args, **kwargs))
+
+class GPUFeatureExtractor(FeatureExtractor):
+    """Log-Mel spectrogram computed with torch.stft on the model device"""
+    
+    def __init__(self, device: str, **kwargs):
+        super().__init__(**kwargs)
+        self.device = torch.device(device)
+        # Mel filters and Hann window are uploaded once and reused for every request
+        self.mel_filters_gpu = torch.from_numpy(self.mel_filters).to(self.device)
+        self.window = torch.hann_window(self.n_fft, device=self.device)
+        self.copy_stream = torch.cuda.Stream(device=self.device)
+    
+    @torch.inference_mode()
+    def __call__(self, waveform: np.ndarray, padding=160, chunk_length=None):
+        if chunk_length is not None:
+            self.n_samples = chunk_length * self.sampling_rate
+            self.nb_max_frames = self.n_samples // self.hop_length
+        
+        # Waveforms from the pinned buffer pool upload asynchronously on a side stream
+        host_audio = torch.from_numpy(np.ascontiguousarray(waveform, dtype=np.float32))
+        with torch.cuda.stream(self.copy_stream):
+            audio = host_audio.to(self.device, non_blocking=True)
+        compute_stream = torch.cuda.current_stream(self.device)
+        compute_stream.wait_stream(self.copy_stream)
+        audio.record_stream(compute_stream)
+        if padding:
+            audio = torch.nn.functional.pad(audio, (0, padding))
+        # torch.stft reflect-pads by n_fft // 2, which fails on shorter input (e.g. the empty
+        # array left when VAD finds no speech); trailing zeros keep the CPU extractor's frame count
+        min_length = self.n_fft // 2 + 1
+        if audio.shape[-1] < min_length:
+            audio = torch.nn.functional.pad(audio, (0, min_length - audio.shape[-1]))
+        
+        stft = torch.stft(audio, self.n_fft, self.hop_length, window=self.window, return_complex=True)
+        magnitudes = stft[..., :-1].abs() ** 2
+        mel_spec = self.mel_filters_gpu @ magnitudes
+        
+        log_spec = torch.clamp(mel_spec, min=1e-10).log10()
+        log_spec = torch.maximum(log_spec, log_spec.max() - 8.0)
+        log_spec = (log_spec + 4.0) / 4.0
+        
+        # CTranslate2 takes host arrays, the mel matrix is small compared to the waveform
+        return log_spec.cpu().numpy()
+
+def pick_compute_type(device_index: int = 0) -> str:
+    """Pick the CTranslate2 compute type for a device"""
+    if config.COMPUTE_TYPE:
+        return config.COMPUTE_TYPE
+    if config.DEVICE == "cuda":
+        # INT8 weights with FP16 activations need tensor cores (Volta and newer)
+        major, _ = torch.cuda.get_device_capability(device_index)
+        return "int8_float16" if major >= 7 else "float16"
+    # INT8 GEMMs only pay off on CPU with enough cores to hide the quantization overhead
+    return "int8" if torch.get_num_threads() > 8 else "float32"
+
+def model_parameters(model_name: str) -> Optional[float]:
+    """Approximate parameter count of a Whisper model family, None if unknown (e.g. a local path)"""
+    name = model_name.rsplit("/", 1)[-1].lower()
+    # Most specific families first: "large-v3-turbo" and "distil-large-v3" also contain "large"
+    for family, parameters in (
+        ("turbo", 809e6),
+        ("distil-large", 756e6),
+        ("large", 1550e6),
+        ("distil-medium", 394e6),
+        ("medium", 769e6),
+    ):
+        if family in name:
+            return parameters
+    return None
+
+def model_memory(model_name: str, compute_type: str) -> float:
+    """Rough VRAM needed by a model in bytes: weights at the compute type plus ~1.5GB of decoding workspace"""
+    if compute_type.startswith("int8"):
+        bytes_per_weight = 1
+    elif compute_type in ("float16", "bfloat16"):
+        bytes_per_weight = 2
+    else:
+        bytes_per_weight = 4
+    return model_parameters(model_name) * bytes_per_weight + 1.5 * 1024 ** 3
+
+def pick_model_name() -> str:
+    """Downgrade models bigger than medium on GPUs that cannot hold them at their compute type"""
+    parameters = model_parameters(config.MODEL_NAME)
+    if config.DEVICE != "cuda" or parameters is None or parameters <= model_parameters("medium"):
+        return config.MODEL_NAME
+    
+    for device_index in range(torch.cuda.device_count()):
+        compute_type = pick_compute_type(device_index)
+        memory = torch.cuda.get_device_properties(device_index).total_memory
+        required = model_memory(config.MODEL_NAME, compute_type)
+        if required > memory:
+            logger.warning(
+                f"Whisper model {config.MODEL_NAME} needs ~{required / 1024 ** 3:.1f}GB of VRAM as "
+                f"{compute_type} but GPU {device_index} has {memory / 1024 ** 3:.1f}GB, falling back to medium"
+            )
+            return "medium"
+    return config.MODEL_NAME
+
+def load_model(device_index: int = 0) -> WhisperModel:
+    """Load one Whisper replica on the given device"""
+    compute_type = pick_compute_type(device_index)
+    logger.info(
+        f"Loading Whisper model: {config.MODEL_NAME} on {config.DEVICE}:{device_index} "
+        f"({compute_type}, {config.BACKEND})"
+    )
+    if config.BACKEND in ("trt", "ort") and config.DEVICE != "cuda":
+        raise RuntimeError(f"{config.BACKEND} backend requires a CUDA device")
+    
+    if config.BACKEND == "trt":
+        from backends.trt_whisper import TRTWhisperModel
+        # Engines are specific to the GPU architecture and the batch profile they were built with
+        major, minor = torch.cuda.get_device_capability(device_index)
+        engine_path = config.TRT_ENGINE_PATH or (
+            f"/root/.cache/whisper-trt/{config.MODEL_NAME}-sm{major}{minor}-b{config.BATCH_SIZE}-encoder.engine"
+        )
+        model = TRTWhisperModel(
+            config.MODEL_NAME,
+            engine_path=engine_path,
+            onnx_path=config.ENCODER_ONNX_PATH,
+            device_index=device_index,
+            compute_type=compute_type,
+            max_batch_size=config.BATCH_SIZE,
+            use_cuda_graph=config.CUDA_GRAPH,
+            num_workers=config.MODEL_CONCURRENCY
+        )
+    elif config.BACKEND == "ort":
+        if config.ENCODER_ONNX_PATH is None:
+            raise RuntimeError("WHISPER_ENCODER_ONNX must point to the exported encoder for the ort backend")
+        from backends.ort_whisper import ORTWhisperModel
+        model = ORTWhisperModel(
+            config.MODEL_NAME,
+            onnx_path=config.ENCODER_ONNX_PATH,
+            device_index=device_index,
+            compute_type=compute_type,
+            max_batch_size=config.BATCH_SIZE,
+            num_workers=config.MODEL_CONCURRENCY
+        )
+    else:
+        model = WhisperModel(
+            config.MODEL_NAME,
+            device=config.DEVICE,
+            device_index=device_index,
+            compute_type=compute_type,
+            num_workers=config.MODEL_CONCURRENCY
+        )
+    
+    if config.DEVICE == "cuda":
+        model.feature_extractor = GPUFeatureExtractor(f"cuda:{device_index}", **model.feat_kwargs)
+    return model
 
 def load_whisper_model():
-    """Load Whisper model on startup"""
-    global whisper_model
+    """Load one Whisper replica per GPU (or a single CPU replica) on startup"""
+    global models_ready, TRANSCRIBE_POOL
     try:
-        logger.info(f"Loading Whisper model: {config.MODEL_NAME} on {config.DEVICE}")
-        whisper_model = whisper.load_model(config.MODEL_NAME, device=config.DEVICE)
-        logger.info("Whisper model loaded successfully")
+        config.MODEL_NAME = pick_model_name()
+        if config.DEVICE == "cuda":
+            for device_index in range(torch.cuda.device_count()):
+                with torch.cuda.device(device_index):
+                    model = load_model(device_index)
+                # Weight dispatch by SM count so faster cards take proportionally more requests
+                weight = torch.cuda.get_device_properties(device_index).multi_processor_count
+                whisper_pool.add(model, weight)
+        else:
+            whisper_pool.add(load_model())
+        logger.info(f"Whisper model loaded successfully ({len(whisper_pool)} replica(s))")
+        
+        TRANSCRIBE_POOL = ThreadPoolExecutor(
+            max_workers=len(whisper_pool) * config.MODEL_CONCURRENCY,
+            thread_name_prefix="transcribe"
+        )
+        
+        start = time.perf_counter()
+        for model in whisper_pool.models:
+            warmup_model(model)
+        logger.info(f"Warmup done in {time.perf_counter() - start:.2f}s")
+        models_ready = True
     except Exception as e:
         logger.error(f"Failed to load Whisper model: {e}")
         raise
 
-def preprocess_audio(audio_file: bytes) -> np.ndarray:
-    """Preprocess audio file for Whisper"""
+def gather_speech(audio_data: np.ndarray, speech_chunks: List[dict]) -> np.ndarray:
+    """Move the VAD speech regions to the front of the buffer in place and return them as one view"""
+    # Unlike np.concatenate this keeps the audio in the pooled (pinned) buffer
+    length = 0
+    for chunk in speech_chunks:
+        count = chunk["end"] - chunk["start"]
+        # Chunks are sorted and disjoint, so the destination never overtakes the source
+        audio_data[length:length + count] = audio_data[chunk["start"]:chunk["end"]]
+        length += count
+    return audio_data[:length]
+
+def run_transcription(model: WhisperModel, audio_data: np.ndarray, **options) -> Dict[str, Any]:
+    """Run faster-whisper and collect its lazy segment generator into a result dict"""
+    duration = len(audio_data) / config.SAMPLE_RATE
+    # Same as vad_filter=True, but the speech is gathered inside the pooled buffer instead of a new array
+    speech_chunks = get_speech_timestamps(audio_data, sampling_rate=config.SAMPLE_RATE)
+    speech = gather_speech(audio_data, speech_chunks)
+    
+    segments, info = model.transcribe(speech, beam_size=1, vad_filter=False, **options)
+    if speech_chunks:
+        segments = restore_speech_timestamps(segments, speech_chunks, config.SAMPLE_RATE)
+    segments = [asdict(segment) for segment in segments]
+    
+    return {
+        "text": "".join(segment["text"] for segment in segments),
+        "language": info.language,
+        "duration": duration,
+        "segments": segments,
+    }
+
+def segment_confidences(avg_logprobs: np.ndarray) -> np.ndarray:
+    """Per-segment probability from average token log-probabilities, in [exp(-10), 1]"""
+    return np.exp(np.clip(avg_logprobs, -10.0, 0.0))
+
+def transcribe_batch(model: WhisperModel, audios: List[np.ndarray], max_length: int) -> List[str]:
+    """Greedy-decode a batch of clips as 30-second mel windows in a single encoder/decoder pass"""
+    tokenizer = Tokenizer(
+        model.hf_tokenizer,
+        model.model.is_multilingual,
+        task="transcribe",
+        language=config.LANGUAGE
+    )
+    prompt = tokenizer.sot_sequence + [tokenizer.no_timestamps]
+    
+    features = np.stack([pad_or_trim(model.feature_extractor(audio)) for audio in audios])
+    encoder_output = model.encode(features)
+    results = model.model.generate(
+        encoder_output,
+        [prompt] * len(features),
+        beam_size=1,
+        max_length=max_length,
+        suppress_blank=True,
+        suppress_tokens=get_suppressed_tokens(tokenizer, [-1]),
+        return_scores=True,
+        return_no_speech_prob=True
+    )
+    
+    texts = []
+    for result in results:
+        tokens = result.sequences_ids[0]
+        # Same average as faster-whisper: scores are length-normalized, the end token counts too
+        avg_logprob = result.scores[0] * len(tokens) / (len(tokens) + 1)
+        # Short confident replies ("네") can score high on no_speech, only drop unconfident ones
+        if result.no_speech_prob > config.NO_SPEECH_THRESHOLD and avg_logprob < config.LOG_PROB_THRESHOLD:
+            texts.append("")
+        else:
+            texts.append(tokenizer.decode(tokens).strip())
+    return texts
+
+def warmup_model(model: WhisperModel):
+    """Run silent 30-second clips through every inference path and batch shape so the first request doesn't pay for setup"""
+    silence = np.zeros(config.SAMPLE_RATE * 30, dtype=np.float32)
+    # The first pass triggers kernel selection and allocator growth, the second runs at steady state
+    for _ in range(2):
+        # VAD would drop the silent clip before it reaches the model
+        segments, _ = model.transcribe(silence, language=config.LANGUAGE, beam_size=1, vad_filter=False)
+        list(segments)
+        transcribe_batch(model, [silence], max_length=config.BATCH_BUCKETS[0] * 25)
+        # Full batches take the eager encoder path (not the batch=1 CUDA graph) and larger allocations
+        transcribe_batch(model, [silence] * config.BATCH_SIZE, max_length=config.BATCH_BUCKETS[0] * 25)
+
+class BatchScheduler:
+    """Collects concurrent quick transcription requests into micro-batches"""
+    
+    def __init__(self, max_batch_size: int, max_wait: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = None
+        self.tasks = []
+    
+    def start(self, consumers: int):
+        """Start one consumer per replica permit"""
+        self.queue = asyncio.Queue()
+        self.tasks = [asyncio.create_task(self.run()) for _ in range(consumers)]
+    
+    async def submit(self, audio_data: np.ndarray, duration: float) -> str:
+        """Queue one request and wait for its text"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((audio_data, duration, future))
+        return await future
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            try:
+                # Hold a replica before collecting: while every replica is busy, requests keep
+                # queueing and are picked up together as soon as one frees up
+                async with whisper_pool.acquire() as replica:
+                    deadline = loop.time() + self.max_wait
+                    while len(batch) < self.max_batch_size:
+                        timeout = deadline - loop.time()
+                        if timeout <= 0:
+                            break
+                        try:
+                            batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                        except asyncio.TimeoutError:
+                            break
+                    
+                    # Short clips need far fewer decoder steps, keep them out of long-clip batches
+                    buckets: Dict[int, list] = {}
+                    for item in batch:
+                        bucket = next((b for b in config.BATCH_BUCKETS if item[1] <= b), config.BATCH_BUCKETS[-1])
+                        buckets.setdefault(bucket, []).append(item)
+                    
+                    for bucket, items in buckets.items():
+                        await self.run_batch(replica, bucket, items)
+            except Exception as e:
+                # Keep the consumer alive and never leave a request waiting forever
+                logger.error(f"Batch scheduler error: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+    
+    async def run_batch(self, replica: WhisperModel, bucket: int, items: list):
+        try:
+            # ~25 tokens per second of speech is a generous upper bound
+            max_length = min(replica.max_length, bucket * 25)
+            audios = [item[0] for item in items]
+            texts = await run_model(transcribe_batch, replica, audios, max_length)
+            for (_, _, future), text in zip(items, texts):
+                if not future.done():
+                    future.set_result(text)
+        except Exception as e:
+            logger.error(f"Batch transcription error: {e}")
+            for _, _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+
+scheduler = BatchScheduler(config.BATCH_SIZE, config.BATCH_WAIT_MS / 1000)
+
+class AudioBufferPool:
+    """Bounded pool of reusable 30-second sample buffers, page-locked when running on CUDA"""
+    
+    def __init__(self, size: int, n_samples: int, pin_memory: bool):
+        self.queue = asyncio.Queue(maxsize=size)
+        for _ in range(size):
+            self.queue.put_nowait(torch.zeros(n_samples, dtype=torch.float32, pin_memory=pin_memory))
+    
+    @asynccontextmanager
+    async def acquire(self):
+        buffer = await self.queue.get()
+        try:
+            yield buffer.numpy()
+        finally:
+            self.queue.put_nowait(buffer)
+
+audio_buffers = None
+
+class SessionCache:
+    """Decoder context carried between /transcribe-stream calls of the same client session"""
+    
+    def __init__(self, ttl: float, max_tokens: int = 223):
+        self.ttl = ttl
+        self.max_tokens = max_tokens  # Whisper keeps at most n_text_ctx // 2 - 1 prompt tokens
+        self.entries: Dict[str, Tuple[float, List[int]]] = {}
+    
+    def evict(self):
+        now = time.monotonic()
+        expired = [key for key, (updated, _) in self.entries.items() if now - updated > self.ttl]
+        for key in expired:
+            del self.entries[key]
+    
+    def get(self, session_id: str) -> Optional[List[int]]:
+        self.evict()
+        entry = self.entries.get(session_id)
+        return entry[1] if entry else None
+    
+    def put(self, session_id: str, tokens: List[int]):
+        previous = self.get(session_id) or []
+        self.entries[session_id] = (time.monotonic(), (previous + tokens)[-self.max_tokens:])
+
+stream_sessions = SessionCache(config.SESSION_TTL)
+
+async def read_upload(file: UploadFile) -> BinaryIO:
+    """Validate upload size and return the spooled upload file for decoding in place"""
+    # The multipart parser has already spooled the upload, so decoding from the
+    # underlying file avoids copying the whole payload into a bytes object
+    size = file.size
+    if size is None:
+        size = file.file.seek(0, io.SEEK_END)
+    if size > config.MAX_FILE_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size: {config.MAX_FILE_SIZE} bytes"
+        )
+    await file.seek(0)
+    return file.file
+
+def ignore_invalid_frames(frames):
+    """Skip frames FFmpeg can't decode, e.g. the cut-off tail of a truncated webm/opus chunk"""
+    iterator = iter(frames)
+    while True:
+        try:
+            yield next(iterator)
+        except StopIteration:
+            break
+        except av.error.InvalidDataError:
+            continue
+
+def decode_with_av(audio_file: BinaryIO, out: np.ndarray) -> int:
+    """Decode any FFmpeg-supported container into out as 16kHz mono float32, returning the sample count"""
+    # libswresample converts, downmixes and resamples in one pass, in-process
+    resampler = av.AudioResampler(format="flt", layout="mono", rate=config.SAMPLE_RATE)
+    length = 0
+    
+    with av.open(audio_file, mode="r", metadata_errors="ignore") as container:
+        frames = ignore_invalid_frames(container.decode(audio=0))
+        # A trailing None flushes the samples still buffered in the resampler
+        for frame in itertools.chain(frames, [None]):
+            for resampled in resampler.resample(frame):
+                samples = resampled.to_ndarray().reshape(-1)
+                count = min(len(samples), len(out) - length)
+                out[length:length + count] = samples[:count]
+                length += count
+            if length == len(out):
+                break
+    
+    # PyAV leaks resampler objects unless the garbage collector runs explicitly
+    # (faster-whisper #390), which adds up in a long-running server
+    del resampler
+    gc.collect()
+    
+    return length
+
+@njit("int64(float32[:, :], float32[:])", cache=True, fastmath=True)
+def downmix_into(samples, out):
+    """Average channels into out and trim to its length in a single pass, returning the sample count"""
+    length = min(samples.shape[0], out.shape[0])
+    channels = samples.shape[1]
+    for i in range(length):
+        total = 0.0
+        for c in range(channels):
+            total += samples[i, c]
+        out[i] = total / channels
+    return length
+
+def preprocess_audio(audio_file: BinaryIO, out: np.ndarray) -> np.ndarray:
+    """Preprocess audio file for Whisper into a reusable 30-second buffer, returning the filled part"""
     try:
-        # Load audio from bytes
-        audio_data, sr = librosa.load(io.BytesIO(audio_file), sr=config.SAMPLE_RATE)
+        # Load audio from the upload (soundfile already returns float32)
+        try:
+            with sf.SoundFile(audio_file) as f:
+                sr = f.samplerate
+                # Only read what fits in the 30-second buffer (Whisper's input length) after resampling
+                frames = math.ceil(len(out) * sr / config.SAMPLE_RATE)
+                audio_data = f.read(frames, dtype="float32", always_2d=True)
+        except sf.LibsndfileError:
+            # Containers libsndfile can't parse (webm, mp4, ...) are decoded with PyAV,
+            # straight into the buffer and stopping once 30 seconds are filled
+            audio_file.seek(0)
+            return out[:decode_with_av(audio_file, out)]
         
-        # Normalize audio
-        audio_data = audio_data.astype(np.float32)
+        # No padding: the mel is only computed over real samples and padded to
+        # 3000 frames by faster-whisper
+        if sr == config.SAMPLE_RATE:
+            return out[:downmix_into(audio_data, out)]
         
-        # Pad or trim to 30 seconds (Whisper's input length)
-        max_length = config.SAMPLE_RATE * 30  # 30 seconds
-        if len(audio_data) > max_length:
-            audio_data = audio_data[:max_length]
-        else:
-            # Pad with zeros if shorter than 30 seconds
-            audio_data = np.pad(audio_data, (0, max_length - len(audio_data)))
+        mono = np.empty(len(audio_data), dtype=np.float32)
+        downmix_into(audio_data, mono)
+        with torch.inference_mode():
+            audio_data = torchaudio.functional.resample(
+                torch.from_numpy(mono), sr, config.SAMPLE_RATE,
+                resampling_method="sinc_interp_kaiser"
+            ).numpy()
+        
+        length = min(len(audio_data), len(out))
+        out[:length] = audio_data[:length]
         
-        return audio_data
+        return out[:length]
     except Exception as e:
         logger.error(f"Audio preprocessing error: {e}")
         raise
@@ -116,13 +631,28 @@ def preprocess_audio(audio_file: bytes) -> np.ndarray:
 @app.on_event("startup")
 async def startup_event():
     """Initialize Whisper model on startup"""
+    global audio_buffers
+    # Every worker process would load its own copy of the model into GPU memory; scale out
+    # with more single-worker instances behind a proxy instead of --workers
     load_whisper_model()
+    logger.warning(
+        f"Using 1 worker + {len(whisper_pool) * config.MODEL_CONCURRENCY} threads to share "
+        f"{len(whisper_pool)} model replica(s)"
+    )
+    # Load the Silero VAD model now instead of on the first quick request
+    get_vad_model()
+    audio_buffers = AudioBufferPool(
+        config.AUDIO_BUFFERS,
+        config.SAMPLE_RATE * 30,
+        pin_memory=config.DEVICE == "cuda"
+    )
+    scheduler.start(len(whisper_pool) * config.MODEL_CONCURRENCY)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
     return HealthResponse(
-        status="healthy" if whisper_model is not None else "unhealthy",
+        status="healthy" if models_ready else "unhealthy",
         model=config.MODEL_NAME,
         device=config.DEVICE,
         timestamp=datetime.now().isoformat()
@@ -152,21 +682,13 @@ async def transcribe_audio(
     """
     Transcribe audio to text using Whisper
     """
-    if whisper_model is None:
+    if len(whisper_pool) == 0:
         raise HTTPException(status_code=503, detail="Whisper model not loaded")
     
+    # Validate file size
+    audio_file = await read_upload(file)
+    
     try:
-        # Validate file size
-        content = await file.read()
-        if len(content) > config.MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=413, 
-                detail=f"File too large. Maximum size: {config.MAX_FILE_SIZE} bytes"
-            )
-        
-        # Preprocess audio
-        audio_data = preprocess_audio(content)
-        
         # Transcription options
         options = {
             "language": language,
@@ -177,12 +699,21 @@ async def transcribe_audio(
         if timestamp_granularities:
             options["word_timestamps"] = True
         
-        # Perform transcription
-        logger.info(f"Transcribing audio with language: {language}")
-        result = whisper_model.transcribe(audio_data, **options)
+        async with audio_buffers.acquire() as buffer:
+            # Preprocess audio
+            audio_data = await run_in_threadpool(preprocess_audio, audio_file, buffer)
+            
+            # Perform transcription (the buffer is held until the mel upload has read it)
+            logger.info(f"Transcribing audio with language: {language}")
+            async with whisper_pool.acquire() as replica:
+                result = await run_model(run_transcription, replica, audio_data, **options)
         
-        # Calculate confidence (approximate)
-        confidence = 1.0 - (result.get("avg_logprob", -1.0) / -1.0) if "avg_logprob" in result else None
+        # Calculate confidence as the mean segment probability
+        segments = result.get("segments") or []
+        confidence = None
+        if segments:
+            avg_logprobs = np.fromiter((segment["avg_logprob"] for segment in segments), dtype=np.float32)
+            confidence = float(segment_confidences(avg_logprobs).mean())
         
         response = TranscriptionResponse(
             text=result["text"].strip(),
@@ -204,27 +735,19 @@ async def detect_language(file: UploadFile = File(...)):
     """
     Detect language from audio
     """
-    if whisper_model is None:
+    if len(whisper_pool) == 0:
         raise HTTPException(status_code=503, detail="Whisper model not loaded")
     
+    audio_file = await read_upload(file)
+    
     try:
-        content = await file.read()
-        if len(content) > config.MAX_FILE_SIZE:
-            raise HTTPException(status_code=413, detail="File too large")
-        
-        # Preprocess audio
-        audio_data = preprocess_audio(content)
-        
-        # Use only first 30 seconds for language detection
-        audio_segment = audio_data[:config.SAMPLE_RATE * 30]
-        
-        # Detect language
-        audio_tensor = torch.from_numpy(audio_segment).to(config.DEVICE)
-        mel = whisper.log_mel_spectrogram(audio_tensor, n_mels=whisper_model.dims.n_mels)
-        
-        _, probs = whisper_model.detect_language(mel)
-        detected_language = max(probs, key=probs.get)
-        confidence = probs[detected_language]
+        async with audio_buffers.acquire() as buffer:
+            # Preprocess audio
+            audio_data = await run_in_threadpool(preprocess_audio, audio_file, buffer)
+            
+            # Detect language (faster-whisper only looks at the first 30 seconds)
+            async with whisper_pool.acquire() as replica:
+                detected_language, confidence, _ = await run_model(replica.detect_language, audio_data)
         
         logger.info(f"Detected language: {detected_language} (confidence: {confidence:.2f})")
         
@@ -242,56 +765,84 @@ async def transcribe_quick(file: UploadFile = File(...)):
     """
     Quick transcription endpoint for real-time chat
     """
+    audio_file = await read_upload(file)
+    
     try:
-        content = await file.read()
-        audio_data = preprocess_audio(content)
-        
-        # Quick transcription with minimal options
-        result = whisper_model.transcribe(
-            audio_data,
-            language=config.LANGUAGE,
-            temperature=0.0,
-            word_timestamps=False
-        )
+        async with audio_buffers.acquire() as buffer:
+            audio_data = await run_in_threadpool(preprocess_audio, audio_file, buffer)
+            
+            # Skip the model entirely for clips without speech and only feed it the speech regions
+            speech_chunks = await run_in_threadpool(
+                get_speech_timestamps, audio_data, sampling_rate=config.SAMPLE_RATE
+            )
+            if not speech_chunks:
+                return {"text": ""}
+            audio_data = gather_speech(audio_data, speech_chunks)
+            
+            # Quick transcription is batched with other concurrent requests
+            text = await scheduler.submit(audio_data, len(audio_data) / config.SAMPLE_RATE)
         
-        return {"text": result["text"].strip()}
+        return {"text": text}
         
     except Exception as e:
         logger.error(f"Quick transcription error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/transcribe-stream")
-async def transcribe_stream(file: UploadFile = File(...)):
+async def transcribe_stream(
+    file: UploadFile = File(...),
+    session_id: Optional[str] = Form(None)
+):
     """
     Streaming transcription for real-time processing
+    
+    Chunks sent with the same session_id are decoded with the previous chunks' tokens as prompt
     """
+    audio_file = await read_upload(file)
+    previous_tokens = stream_sessions.get(session_id) if session_id else None
+    
     try:
-        content = await file.read()
-        audio_data = preprocess_audio(content)
+        async with audio_buffers.acquire() as buffer:
+            audio_data = await run_in_threadpool(preprocess_audio, audio_file, buffer)
+            
+            # Transcribe with segments for streaming
+            async with whisper_pool.acquire() as replica:
+                result = await run_model(
+                    run_transcription,
+                    replica,
+                    audio_data,
+                    language=config.LANGUAGE,
+                    word_timestamps=True,
+                    condition_on_previous_text=True,
+                    initial_prompt=previous_tokens
+                )
         
-        # Transcribe with segments for streaming
-        result = whisper_model.transcribe(
-            audio_data,
-            language=config.LANGUAGE,
-            word_timestamps=True,
-            condition_on_previous_text=True
-        )
+        if session_id:
+            stream_sessions.put(session_id, [t for segment in result["segments"] for t in segment["tokens"]])
         
-        # Return segments for streaming
-        segments = []
+        # Return segments for streaming as columns instead of one dict per segment
+        texts = []
+        starts = array.array("d")
+        ends = array.array("d")
+        logprobs = array.array("d")
         for segment in result.get("segments", []):
-            segments.append({
-                "text": segment["text"].strip(),
-                "start": segment["start"],
-                "end": segment["end"],
-                "confidence": 1.0 - abs(segment.get("avg_logprob", -1.0))
-            })
+            texts.append(segment["text"].strip())
+            starts.append(segment["start"])
+            ends.append(segment["end"])
+            logprobs.append(segment.get("avg_logprob", -1.0))
+        confidences = segment_confidences(np.frombuffer(logprobs, dtype=np.float64))
         
-        return {
+        # Plain lists and floats only, so skip jsonable_encoder and hand them straight to orjson
+        return ORJSONResponse({
             "text": result["text"].strip(),
-            "segments": segments,
+            "segments": {
+                "text": texts,
+                "start": starts.tolist(),
+                "end": ends.tolist(),
+                "confidence": confidences.tolist()
+            },
             "language": result.get("language")
-        }
+        })
         
     except Exception as e:
         logger.error(f"Stream transcription error: {e}")
@@ -325,5 +876,7 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=5001,
         reload=True,
+        workers=1,
+        loop="uvloop",
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""
+Alternative Whisper encoder backends
+Each backend subclasses faster-whisper's WhisperModel and only replaces the encoder,
+so decoding, VAD and timestamps keep using CTranslate2
+"""
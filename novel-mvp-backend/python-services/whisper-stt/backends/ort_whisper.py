@@ -0,0 +1,146 @@
+"""
+ONNX Runtime Whisper encoder backend
+Runs the Whisper encoder with the CUDA execution provider and I/O binding so
+mel features and encoder states stay in pre-allocated GPU buffers
+"""
+
+import logging
+import threading
+from pathlib import Path
+
+import ctranslate2
+import numpy as np
+import onnxruntime as ort
+import torch
+from faster_whisper import WhisperModel
+
+logger = logging.getLogger(__name__)
+
+TORCH_DTYPES = {
+    "tensor(float)": torch.float32,
+    "tensor(float16)": torch.float16,
+}
+
+NUMPY_DTYPES = {
+    torch.float32: np.float32,
+    torch.float16: np.float16,
+}
+
+
+def optimize_encoder(onnx_path: str, optimized_path: str) -> None:
+    """Fuse attention into MultiHeadAttention kernels and convert the encoder to FP16"""
+    from onnxruntime.transformers.fusion_options import FusionOptions
+    from onnxruntime.transformers.optimizer import optimize_model
+
+    logger.info(f"Optimizing ONNX encoder {onnx_path}")
+    fusion_options = FusionOptions("bart")
+    fusion_options.use_multi_head_attention = True
+    model = optimize_model(
+        onnx_path,
+        model_type="bart",
+        num_heads=0,
+        hidden_size=0,
+        optimization_options=fusion_options,
+        use_gpu=True
+    )
+    model.convert_float_to_float16()
+    model.save_model_to_file(optimized_path)
+    logger.info(f"Optimized encoder saved to {optimized_path}")
+
+
+class ORTWhisperModel(WhisperModel):
+    """faster-whisper model whose encoder runs on ONNX Runtime (CUDA)"""
+
+    def __init__(
+        self,
+        model_size_or_path: str,
+        onnx_path: str,
+        device_index: int = 0,
+        compute_type: str = "float16",
+        max_batch_size: int = 8,
+        **kwargs
+    ):
+        super().__init__(
+            model_size_or_path,
+            device="cuda",
+            device_index=device_index,
+            compute_type=compute_type,
+            **kwargs
+        )
+        if not Path(onnx_path).exists():
+            raise FileNotFoundError(f"ONNX encoder not found: {onnx_path}")
+        optimized_path = str(Path(onnx_path).with_suffix(".opt.onnx"))
+        if not Path(optimized_path).exists():
+            optimize_encoder(onnx_path, optimized_path)
+
+        self.device = torch.device("cuda", device_index)
+        self.device_index = device_index
+        # Encoder output must match the activation type of the CTranslate2 decoder
+        self.output_dtype = torch.float16 if "float16" in compute_type else torch.float32
+
+        self.session = ort.InferenceSession(
+            optimized_path,
+            providers=[("CUDAExecutionProvider", {"device_id": device_index})]
+        )
+        # The CPU-only onnxruntime wheel silently falls back to CPU, where the CUDA I/O binding fails
+        if "CUDAExecutionProvider" not in self.session.get_providers():
+            raise RuntimeError(
+                "ONNX Runtime CUDA execution provider is unavailable, install onnxruntime-gpu "
+                "in place of onnxruntime for the ort backend"
+            )
+        encoder_input = self.session.get_inputs()[0]
+        encoder_output = self.session.get_outputs()[0]
+        self.input_name = encoder_input.name
+        self.output_name = encoder_output.name
+        self.input_dtype = TORCH_DTYPES[encoder_input.type]
+        self.engine_output_dtype = TORCH_DTYPES[encoder_output.type]
+        self.d_model = encoder_output.shape[-1]
+
+        # Persistent input buffers, reused by every request
+        n_mels = self.feature_extractor.mel_filters.shape[0]
+        input_shape = (max_batch_size, n_mels, 3000)
+        self.max_batch_size = max_batch_size
+        self.host_input = torch.empty(input_shape, dtype=self.input_dtype, pin_memory=True)
+        self.device_input = torch.empty(input_shape, dtype=self.input_dtype, device=self.device)
+
+        self.lock = threading.Lock()
+        # CTranslate2 does not copy the encoder output, keep it alive until the
+        # calling thread encodes its next window
+        self.local = threading.local()
+        logger.info(f"ONNX Runtime encoder loaded from {optimized_path}")
+
+    @torch.inference_mode()
+    def encode(self, features: np.ndarray) -> ctranslate2.StorageView:
+        if features.ndim == 2:
+            features = np.expand_dims(features, 0)
+        batch_size = features.shape[0]
+        if batch_size > self.max_batch_size:
+            raise ValueError(f"Batch size {batch_size} exceeds encoder maximum {self.max_batch_size}")
+
+        with self.lock:
+            host_input = self.host_input[:batch_size]
+            host_input.numpy()[...] = features
+            device_input = self.device_input[:batch_size]
+            device_input.copy_(host_input)
+
+            # Encoder downsamples 3000 mel frames to 1500 states
+            output = torch.empty(
+                (batch_size, 1500, self.d_model),
+                dtype=self.engine_output_dtype,
+                device=self.device
+            )
+            io_binding = self.session.io_binding()
+            io_binding.bind_input(
+                self.input_name, "cuda", self.device_index,
+                NUMPY_DTYPES[self.input_dtype], tuple(device_input.shape), device_input.data_ptr()
+            )
+            io_binding.bind_output(
+                self.output_name, "cuda", self.device_index,
+                NUMPY_DTYPES[self.engine_output_dtype], tuple(output.shape), output.data_ptr()
+            )
+            self.session.run_with_iobinding(io_binding)
+            output = output.to(self.output_dtype)
+            torch.cuda.synchronize(self.device)
+
+        self.local.output = output
+        return ctranslate2.StorageView.from_array(output)
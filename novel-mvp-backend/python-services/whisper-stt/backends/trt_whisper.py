@@ -0,0 +1,193 @@
+"""
+TensorRT Whisper encoder backend
+Runs the Whisper encoder from a serialized TensorRT engine and hands the
+encoder output to the CTranslate2 decoder used by faster-whisper
+"""
+
+import logging
+import threading
+from pathlib import Path
+
+import ctranslate2
+import numpy as np
+import tensorrt as trt
+import torch
+from faster_whisper import WhisperModel
+
+logger = logging.getLogger(__name__)
+
+TRT_LOGGER = trt.Logger(trt.Logger.WARNING)
+
+TORCH_DTYPES = {
+    trt.float32: torch.float32,
+    trt.float16: torch.float16,
+}
+
+
+def build_engine(onnx_path: str, engine_path: str, n_mels: int, max_batch_size: int) -> None:
+    """Build an FP16 TensorRT engine from an ONNX encoder export and cache it on disk"""
+    logger.info(f"Building TensorRT engine from {onnx_path} (this can take several minutes)")
+    builder = trt.Builder(TRT_LOGGER)
+    network = builder.create_network(1 << int(trt.NetworkDefinitionCreationFlag.EXPLICIT_BATCH))
+    parser = trt.OnnxParser(network, TRT_LOGGER)
+    if not parser.parse_from_file(onnx_path):
+        errors = [str(parser.get_error(i)) for i in range(parser.num_errors)]
+        raise RuntimeError(f"Failed to parse ONNX encoder: {errors}")
+
+    builder_config = builder.create_builder_config()
+    builder_config.set_flag(trt.BuilderFlag.FP16)
+
+    # Whisper always feeds 30-second windows, only the batch dimension is dynamic
+    input_name = network.get_input(0).name
+    profile = builder.create_optimization_profile()
+    profile.set_shape(input_name, (1, n_mels, 3000), (1, n_mels, 3000), (max_batch_size, n_mels, 3000))
+    builder_config.add_optimization_profile(profile)
+
+    serialized_engine = builder.build_serialized_network(network, builder_config)
+    if serialized_engine is None:
+        raise RuntimeError("TensorRT engine build failed")
+
+    Path(engine_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(engine_path, "wb") as f:
+        f.write(serialized_engine)
+    logger.info(f"TensorRT engine saved to {engine_path}")
+
+
+class TRTWhisperModel(WhisperModel):
+    """faster-whisper model whose encoder runs on a TensorRT engine"""
+
+    def __init__(
+        self,
+        model_size_or_path: str,
+        engine_path: str,
+        onnx_path: str = None,
+        device_index: int = 0,
+        compute_type: str = "float16",
+        max_batch_size: int = 8,
+        use_cuda_graph: bool = True,
+        **kwargs
+    ):
+        super().__init__(
+            model_size_or_path,
+            device="cuda",
+            device_index=device_index,
+            compute_type=compute_type,
+            **kwargs
+        )
+        n_mels = self.feature_extractor.mel_filters.shape[0]
+        if not Path(engine_path).exists():
+            if onnx_path is None:
+                raise FileNotFoundError(f"TensorRT engine not found: {engine_path}")
+            build_engine(onnx_path, engine_path, n_mels, max_batch_size)
+
+        self.device = torch.device("cuda", device_index)
+        # Encoder output must match the activation type of the CTranslate2 decoder
+        self.output_dtype = torch.float16 if "float16" in compute_type else torch.float32
+
+        self.load_engine(engine_path)
+        # An engine cached under a smaller WHISPER_BATCH_SIZE would reject large batches at request time
+        engine_max_batch = self.engine.get_tensor_profile_shape(self.input_name, 0)[2][0]
+        if engine_max_batch < max_batch_size:
+            if onnx_path is None:
+                raise RuntimeError(
+                    f"TensorRT engine {engine_path} supports batches up to {engine_max_batch}, "
+                    f"{max_batch_size} required"
+                )
+            logger.warning(f"TensorRT engine max batch {engine_max_batch} < {max_batch_size}, rebuilding")
+            build_engine(onnx_path, engine_path, n_mels, max_batch_size)
+            self.load_engine(engine_path)
+        self.context = self.engine.create_execution_context()
+
+        self.input_dtype = TORCH_DTYPES[self.engine.get_tensor_dtype(self.input_name)]
+        self.engine_output_dtype = TORCH_DTYPES[self.engine.get_tensor_dtype(self.output_name)]
+
+        # Persistent stream and input buffers, reused by every request
+        input_shape = (max_batch_size, n_mels, 3000)
+        self.max_batch_size = max_batch_size
+        self.stream = torch.cuda.Stream(device=self.device)
+        self.host_input = torch.empty(input_shape, dtype=self.input_dtype, pin_memory=True)
+        self.device_input = torch.empty(input_shape, dtype=self.input_dtype, device=self.device)
+
+        # The engine is shared between threads, but an execution context is not
+        self.lock = threading.Lock()
+        # CTranslate2 does not copy the encoder output, keep it alive until the
+        # calling thread encodes its next window
+        self.local = threading.local()
+
+        self.graph = None
+        if use_cuda_graph:
+            self.capture_graph(n_mels)
+        logger.info(f"TensorRT encoder loaded from {engine_path}")
+
+    def load_engine(self, engine_path: str) -> None:
+        """Deserialize the engine and look up its input and output tensor names"""
+        with open(engine_path, "rb") as f:
+            self.engine = trt.Runtime(TRT_LOGGER).deserialize_cuda_engine(f.read())
+        if self.engine is None:
+            # Typically an engine built on a different GPU architecture or TensorRT version
+            raise RuntimeError(f"Failed to deserialize TensorRT engine {engine_path}")
+        names = [self.engine.get_tensor_name(i) for i in range(self.engine.num_io_tensors)]
+        self.input_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.INPUT)
+        self.output_name = next(n for n in names if self.engine.get_tensor_mode(n) == trt.TensorIOMode.OUTPUT)
+
+    def capture_graph(self, n_mels: int) -> None:
+        """Capture the batch=1 encoder launch so real-time requests replay a single CUDA graph"""
+        # A dedicated context keeps the captured activation memory away from eager batched calls
+        self.graph_context = self.engine.create_execution_context()
+        self.graph_input = torch.zeros((1, n_mels, 3000), dtype=self.input_dtype, device=self.device)
+        self.graph_context.set_input_shape(self.input_name, tuple(self.graph_input.shape))
+        self.graph_output = torch.empty(
+            tuple(self.graph_context.get_tensor_shape(self.output_name)),
+            dtype=self.engine_output_dtype,
+            device=self.device
+        )
+        self.graph_context.set_tensor_address(self.input_name, self.graph_input.data_ptr())
+        self.graph_context.set_tensor_address(self.output_name, self.graph_output.data_ptr())
+
+        with torch.cuda.stream(self.stream):
+            # TensorRT defers some setup to the first enqueue, which must not be captured
+            self.graph_context.execute_async_v3(self.stream.cuda_stream)
+            self.stream.synchronize()
+
+            self.graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(self.graph, stream=self.stream):
+                self.graph_context.execute_async_v3(self.stream.cuda_stream)
+        logger.info("Captured CUDA graph for batch=1 encoder")
+
+    @torch.inference_mode()
+    def encode(self, features: np.ndarray) -> ctranslate2.StorageView:
+        if features.ndim == 2:
+            features = np.expand_dims(features, 0)
+        batch_size = features.shape[0]
+        if batch_size > self.max_batch_size:
+            raise ValueError(f"Batch size {batch_size} exceeds engine maximum {self.max_batch_size}")
+
+        with self.lock, torch.cuda.stream(self.stream):
+            host_input = self.host_input[:batch_size]
+            host_input.numpy()[...] = features
+            if batch_size == 1 and self.graph is not None:
+                self.graph_input.copy_(host_input, non_blocking=True)
+                self.graph.replay()
+                # The static output is overwritten by the next replay, hand out a copy
+                output = self.graph_output.to(self.output_dtype, copy=True)
+                self.stream.synchronize()
+                self.local.output = output
+                return ctranslate2.StorageView.from_array(output)
+
+            device_input = self.device_input[:batch_size]
+            device_input.copy_(host_input, non_blocking=True)
+
+            self.context.set_input_shape(self.input_name, tuple(device_input.shape))
+            output = torch.empty(
+                tuple(self.context.get_tensor_shape(self.output_name)),
+                dtype=self.engine_output_dtype,
+                device=self.device
+            )
+            self.context.set_tensor_address(self.input_name, device_input.data_ptr())
+            self.context.set_tensor_address(self.output_name, output.data_ptr())
+            self.context.execute_async_v3(self.stream.cuda_stream)
+            output = output.to(self.output_dtype)
+            self.stream.synchronize()
+
+        self.local.output = output
+        return ctranslate2.StorageView.from_array(output)